@@ -1,6 +1,7 @@
 import psycopg2
 import json
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,26 +15,28 @@ class DBManager:
         
     def connect(self):
         try:
-            # Get PostgreSQL connection parameters from environment variables
-            # with fallbacks to defaults
-            db_host = os.getenv("DB_HOST", "localhost")
-            db_port = os.getenv("DB_PORT", "5432")
-            db_name = os.getenv("DB_NAME", "emotion_recognition")
-            db_user = os.getenv("DB_USER", "postgres")
-            db_password = os.getenv("DB_PASSWORD", "postgres")
-            
-            self.conn = psycopg2.connect(
-                host=db_host,
-                port=db_port,
-                dbname=db_name,
-                user=db_user,
-                password=db_password
-            )
-            
+            self.conn = self.open_connection()
             print("Database connection established")
         except Exception as e:
             print(f"Error connecting to database: {str(e)}")
     
+    def open_connection(self):
+        # Get PostgreSQL connection parameters from environment variables
+        # with fallbacks to defaults
+        db_host = os.getenv("DB_HOST", "localhost")
+        db_port = os.getenv("DB_PORT", "5432")
+        db_name = os.getenv("DB_NAME", "emotion_recognition")
+        db_user = os.getenv("DB_USER", "postgres")
+        db_password = os.getenv("DB_PASSWORD", "postgres")
+        
+        return psycopg2.connect(
+            host=db_host,
+            port=db_port,
+            dbname=db_name,
+            user=db_user,
+            password=db_password
+        )
+    
     def create_tables(self):
         try:
             cursor = self.conn.cursor()
@@ -73,6 +76,16 @@ class DBManager:
             )
             ''')
             
+            # Indexes for keyset pagination and exports ordered by (timestamp, id)
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_detections_timestamp_id
+            ON detections (timestamp, id)
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_detections_camera_timestamp_id
+            ON detections (camera_id, timestamp, id)
+            ''')
+            
             # Insert default admin user if none exists
             cursor.execute('''
             INSERT INTO users (username, password, is_admin)
@@ -131,47 +144,60 @@ class DBManager:
             print(f"Error getting cameras: {str(e)}")
             return []
     
-    def get_detections(self, camera_id=None, from_time=None, to_time=None, limit=100):
+    def _detection_query(self, camera_id=None, from_time=None, to_time=None):
+        query = "SELECT id, camera_id, timestamp, emotion, confidence, face_location, created_at FROM detections"
+        params = []
+        
+        # Add filters
+        conditions = []
+        if camera_id:
+            conditions.append("camera_id = %s")
+            params.append(camera_id)
+        
+        if from_time:
+            conditions.append("timestamp >= %s")
+            params.append(from_time)
+            
+        if to_time:
+            conditions.append("timestamp <= %s")
+            params.append(to_time)
+        
+        return query, conditions, params
+    
+    def _detection_row(self, row):
+        return {
+            "id": row[0],
+            "camera_id": row[1],
+            "timestamp": row[2],
+            "emotion": row[3],
+            "confidence": row[4],
+            "face_location": row[5],
+            "created_at": row[6].isoformat() if row[6] else None
+        }
+    
+    def get_detections(self, camera_id=None, from_time=None, to_time=None, limit=100,
+                       before_timestamp=None, before_id=None):
+        """Newest detections first; pass the (timestamp, id) of the last row to get the next page"""
         try:
             cursor = self.conn.cursor()
             
-            query = "SELECT id, camera_id, timestamp, emotion, confidence, face_location, created_at FROM detections"
-            params = []
-            
-            # Add filters
-            conditions = []
-            if camera_id:
-                conditions.append("camera_id = %s")
-                params.append(camera_id)
+            query, conditions, params = self._detection_query(camera_id, from_time, to_time)
             
-            if from_time:
-                conditions.append("timestamp >= %s")
-                params.append(from_time)
-                
-            if to_time:
-                conditions.append("timestamp <= %s")
-                params.append(to_time)
+            # Keyset cursor: rows strictly older than the last row of the previous page
+            if before_timestamp is not None and before_id is not None:
+                conditions.append("(timestamp, id) < (%s, %s)")
+                params.extend([before_timestamp, before_id])
                 
             if conditions:
                 query += " WHERE " + " AND ".join(conditions)
             
             # Add order and limit
-            query += " ORDER BY timestamp DESC LIMIT %s"
+            query += " ORDER BY timestamp DESC, id DESC LIMIT %s"
             params.append(limit)
             
             cursor.execute(query, params)
             
-            detections = []
-            for row in cursor.fetchall():
-                detections.append({
-                    "id": row[0],
-                    "camera_id": row[1],
-                    "timestamp": row[2],
-                    "emotion": row[3],
-                    "confidence": row[4],
-                    "face_location": row[5],
-                    "created_at": row[6].isoformat() if row[6] else None
-                })
+            detections = [self._detection_row(row) for row in cursor.fetchall()]
             
             cursor.close()
             return detections
@@ -179,6 +205,39 @@ class DBManager:
             print(f"Error getting detections: {str(e)}")
             return []
     
+    def iter_detections(self, camera_id=None, from_time=None, to_time=None, batch_size=5000):
+        """Yield detections in batches, oldest first, using a server-side cursor.
+        
+        The export runs on its own connection so commits from other requests
+        on the shared connection do not close the named cursor mid-stream.
+        """
+        conn = None
+        try:
+            conn = self.open_connection()
+            cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+            cursor.itersize = batch_size
+            
+            query, conditions, params = self._detection_query(camera_id, from_time, to_time)
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY timestamp, id"
+            
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [self._detection_row(row) for row in rows]
+            
+            cursor.close()
+        except Exception as e:
+            # Re-raise so a failed export aborts the response instead of ending early
+            print(f"Error exporting detections: {str(e)}")
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+    
     def add_camera(self, camera_id, name, url, camera_type):
         try:
             cursor = self.conn.cursor()
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+# Cột xuất ra, theo thứ tự của bảng detections
+EXPORT_COLUMNS = ("id", "camera_id", "timestamp", "emotion", "confidence", "face_location", "created_at")
+
+
+def ndjson_chunks(batches):
+    """One JSON object per line, one chunk per batch"""
+    for batch in batches:
+        yield "".join(json.dumps(row) + "\n" for row in batch)
+
+
+def csv_chunks(batches):
+    """CSV with a header row; face_location is written as a JSON string"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([json.dumps(row[c]) if c == "face_location" else row[c] for c in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("camera_id", pa.string()),
+        ("timestamp", pa.float64()),
+        ("emotion", pa.string()),
+        ("confidence", pa.float64()),
+        ("face_location", pa.string()),
+        ("created_at", pa.string()),
+    ])
+
+
+def _arrow_batch(pa, schema, batch):
+    columns = {c: [row[c] for row in batch] for c in EXPORT_COLUMNS}
+    columns["face_location"] = [json.dumps(v) for v in columns["face_location"]]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def arrow_chunks(batches):
+    """Arrow IPC stream, one record batch per database batch"""
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(_arrow_batch(pa, schema, batch))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # End-of-stream marker written on close
+    yield sink.getvalue()
+
+
+def write_parquet(batches, path):
+    """Write batches to a Parquet file, one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(_arrow_batch(pa, schema, batch))
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+
+# Thứ tự cảm xúc cố định do DeepFace trả về
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+
+class FaceTrack:
+    """Exponential moving average of emotion vectors for one face seen by one camera"""
+
+    def __init__(self, track_id, face_location, timestamp):
+        self.track_id = track_id
+        # One score per emotion, in EMOTION_LABELS order
+        self.scores = None
+        self.face_location = face_location
+        self.last_seen = timestamp
+        self.stable_emotion = None
+        self.last_persisted = None
+
+    def push(self, vector, elapsed, time_constant):
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.scores is None:
+            self.scores = vector
+            return
+        # Weight depends on elapsed time, so the lag is the same at any frame rate
+        alpha = 1.0 - np.exp(-elapsed / time_constant) if time_constant > 0 else 1.0
+        self.scores += alpha * (vector - self.scores)
+
+
+class EmotionSmoother:
+    """Aggregate per-frame emotions into stable labels for each tracked face.
+
+    Faces are matched to the nearest track of the same camera by the distance
+    between face centers. A track only switches label when the new emotion
+    leads the current one by a margin of the smoothed scores, and a detection
+    is only worth persisting on a label change or once per sample interval.
+
+    Tracks expire after track_ttl seconds without a matching face, which
+    defaults to three capture intervals of the client (frame_interval).
+    """
+
+    def __init__(self, time_constant=None, margin=None, sample_interval=None,
+                 max_distance=None, track_ttl=None, frame_interval=None):
+        self.time_constant = time_constant if time_constant is not None else float(os.getenv("EMOTION_SMOOTHING_TIME_CONSTANT", "8"))
+        self.frame_interval = frame_interval if frame_interval is not None else float(os.getenv("EMOTION_FRAME_INTERVAL", "4"))
+        self.margin = margin if margin is not None else float(os.getenv("EMOTION_SMOOTHING_MARGIN", "0.1"))
+        self.sample_interval = sample_interval if sample_interval is not None else float(os.getenv("EMOTION_SAMPLE_INTERVAL", "30"))
+        self.max_distance = max_distance if max_distance is not None else float(os.getenv("EMOTION_TRACK_MAX_DISTANCE", "0.5"))
+        if track_ttl is None:
+            track_ttl = os.getenv("EMOTION_TRACK_TTL")
+        self.track_ttl = float(track_ttl) if track_ttl else 3 * self.frame_interval
+        self.tracks: dict = {}
+        self.next_track_id = 0
+
+    def update(self, camera_id, emotion, face_location, timestamp):
+        """Feed one face of a frame and return its smoothed state"""
+        track = self._match_track(camera_id, face_location, timestamp)
+        elapsed = timestamp - track.last_seen
+        track.face_location = face_location
+        track.last_seen = timestamp
+        track.push([emotion.get(label, 0.0) for label in EMOTION_LABELS], elapsed, self.time_constant)
+
+        scores = track.scores
+        candidate = int(np.argmax(scores))
+        candidate_emotion = EMOTION_LABELS[candidate]
+        label_changed = False
+        if track.stable_emotion is None:
+            track.stable_emotion = candidate_emotion
+            label_changed = True
+        elif candidate_emotion != track.stable_emotion:
+            current = scores[EMOTION_LABELS.index(track.stable_emotion)]
+            if scores[candidate] - current > self.margin * scores.sum():
+                track.stable_emotion = candidate_emotion
+                label_changed = True
+
+        persist = (label_changed or track.last_persisted is None
+                   or timestamp - track.last_persisted >= self.sample_interval)
+        if persist:
+            track.last_persisted = timestamp
+
+        return {
+            "track_id": track.track_id,
+            "emotion": track.stable_emotion,
+            "emotions": {label: float(score) for label, score in zip(EMOTION_LABELS, scores)},
+            "persist": persist,
+        }
+
+    def _match_track(self, camera_id, face_location, timestamp):
+        camera_tracks = self.tracks.setdefault(camera_id, [])
+        # Bỏ các track không còn xuất hiện
+        camera_tracks[:] = [t for t in camera_tracks if timestamp - t.last_seen <= self.track_ttl]
+
+        cx, cy = self._center(face_location)
+        size = max(face_location.get("width", 0), face_location.get("height", 0), 1)
+        best, best_distance = None, None
+        for track in camera_tracks:
+            # A track already matched in this frame belongs to another face
+            if track.last_seen == timestamp:
+                continue
+            tx, ty = self._center(track.face_location)
+            distance = np.hypot(cx - tx, cy - ty) / size
+            if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                best, best_distance = track, distance
+
+        if best is None:
+            best = FaceTrack(self.next_track_id, face_location, timestamp)
+            self.next_track_id += 1
+            camera_tracks.append(best)
+        return best
+
+    @staticmethod
+    def _center(face_location):
+        return (face_location.get("x", 0) + face_location.get("width", 0) / 2,
+                face_location.get("y", 0) + face_location.get("height", 0) / 2)
@@ -1,5 +1,7 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 import cv2
 import numpy as np
 import base64
@@ -7,9 +9,14 @@ import json
 import os
 import time
 import datetime
+import importlib.util
+import itertools
+import tempfile
 from pathlib import Path
 from deepface import DeepFace
 from .db_manager import DBManager
+from .emotion_smoother import EmotionSmoother
+from . import detection_export
 import traceback
 
 app = FastAPI()
@@ -21,11 +28,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Initialize database connection
 db_manager = DBManager()
 
+# Làm mượt cảm xúc theo thời gian cho từng khuôn mặt trên mỗi camera
+emotion_smoother = EmotionSmoother()
+
 # Store active connections
 class ConnectionManager:
     def __init__(self):
@@ -58,13 +69,16 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str, camera_id: st
             # Decode the base64 image
             try:
                 # Expecting format: "data:image/jpeg;base64,<actual_base64>"
+                decode_start = time.time()
                 image_data = data.split(",")[1] if "," in data else data
                 frame_bytes = base64.b64decode(image_data)
                 frame_np = np.frombuffer(frame_bytes, dtype=np.uint8)
                 frame = cv2.imdecode(frame_np, cv2.IMREAD_COLOR)
+                decode_time = time.time() - decode_start
                 
                 # Process the frame with DeepFace
                 results = process_frame(frame, camera_id)
+                results.setdefault("timings", {})["decode"] = decode_time
                 
                 # Send back the results
                 await manager.send_message(json.dumps(results), client_id)
@@ -99,10 +113,12 @@ async def process_frame_endpoint(request: Request):
         
         # Expecting format: "data:image/jpeg;base64,<actual_base64>"
         try:
+            decode_start = time.time()
             image_data = frame_data.split(",")[1] if "," in frame_data else frame_data
             frame_bytes = base64.b64decode(image_data)
             frame_np = np.frombuffer(frame_bytes, dtype=np.uint8)
             frame = cv2.imdecode(frame_np, cv2.IMREAD_COLOR)
+            decode_time = time.time() - decode_start
         except Exception as decode_error:
             print(f"Lỗi giải mã ảnh: {str(decode_error)}")
             return {"error": f"Không thể giải mã ảnh: {str(decode_error)}"}
@@ -144,6 +160,7 @@ async def process_frame_endpoint(request: Request):
         
         # Add processing time to results
         results["processing_time"] = processing_time
+        results.setdefault("timings", {})["decode"] = decode_time
         
         # Thêm thông tin về camera
         results["camera_type"] = camera_type
@@ -164,19 +181,28 @@ async def process_frame_endpoint(request: Request):
 async def upload_frame(camera_id: str, file: UploadFile = File(...)):
     try:
         contents = await file.read()
+        decode_start = time.time()
         frame_np = np.frombuffer(contents, dtype=np.uint8)
         frame = cv2.imdecode(frame_np, cv2.IMREAD_COLOR)
+        decode_time = time.time() - decode_start
         
         # Process the frame with DeepFace
         results = process_frame(frame, camera_id)
+        results.setdefault("timings", {})["decode"] = decode_time
         return results
     except Exception as e:
         return {"error": str(e)}
 
 def process_frame(frame, camera_id):
     try:
+        # Thời gian từng bước xử lý (giây), dùng cho benchmark
+        timings = {}
+        
         # Analyze emotions with DeepFace
+        stage_start = time.time()
         analysis = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
+        timings["inference"] = time.time() - stage_start
+        stage_start = time.time()
         
         # Create a copy of the original frame for drawing
         result_frame = frame.copy()
@@ -199,6 +225,13 @@ def process_frame(frame, camera_id):
                 w = region.get("w", 0)
                 h = region.get("h", 0)
                 
+                # Replace the per-frame label with the smoothed one of the tracked face
+                raw_emotion = emotion
+                raw_dominant_emotion = dominant_emotion
+                smoothed = emotion_smoother.update(camera_id, raw_emotion, {"x": x, "y": y, "width": w, "height": h}, timestamp)
+                emotion = smoothed["emotions"]
+                dominant_emotion = smoothed["emotion"]
+                
                 # Draw rectangle around face
                 cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
                 
@@ -231,6 +264,10 @@ def process_frame(frame, camera_id):
                 results.append({
                     "dominant_emotion": dominant_emotion,
                     "emotions": emotion,
+                    "raw_dominant_emotion": raw_dominant_emotion,
+                    "raw_emotions": raw_emotion,
+                    "track_id": smoothed["track_id"],
+                    "persisted": smoothed["persist"],
                     "face_location": {"x": x, "y": y, "width": w, "height": h}
                 })
         else:
@@ -244,6 +281,13 @@ def process_frame(frame, camera_id):
             w = region.get("w", 0)
             h = region.get("h", 0)
             
+            # Replace the per-frame label with the smoothed one of the tracked face
+            raw_emotion = emotion
+            raw_dominant_emotion = dominant_emotion
+            smoothed = emotion_smoother.update(camera_id, raw_emotion, {"x": x, "y": y, "width": w, "height": h}, timestamp)
+            emotion = smoothed["emotions"]
+            dominant_emotion = smoothed["emotion"]
+            
             # Draw rectangle around face
             cv2.rectangle(result_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
             
@@ -276,11 +320,19 @@ def process_frame(frame, camera_id):
             results = [{
                 "dominant_emotion": dominant_emotion,
                 "emotions": emotion,
+                "raw_dominant_emotion": raw_dominant_emotion,
+                "raw_emotions": raw_emotion,
+                "track_id": smoothed["track_id"],
+                "persisted": smoothed["persist"],
                 "face_location": {"x": x, "y": y, "width": w, "height": h}
             }]
         
-        # Store results in database
-        for face_result in results:
+        timings["annotate"] = time.time() - stage_start
+        
+        # Store results in database, only on label changes or per sample interval
+        stage_start = time.time()
+        persisted_results = [r for r in results if r["persisted"]]
+        for face_result in persisted_results:
             db_manager.store_detection(
                 camera_id=camera_id,
                 timestamp=timestamp,
@@ -288,10 +340,13 @@ def process_frame(frame, camera_id):
                 confidence=face_result["emotions"][face_result["dominant_emotion"]],
                 face_location=face_result["face_location"]
             )
+        if persisted_results:
+            timings["storage"] = time.time() - stage_start
         
         # Save the image with emotion detection
-        if len(results) > 0:  # Only save if faces were detected
+        if len(persisted_results) > 0:  # Only save if a face was persisted
             try:
+                stage_start = time.time()
                 # Tạo thư mục gốc nếu chưa tồn tại
                 root_images_dir = Path("detected_images")
                 if not root_images_dir.exists():
@@ -311,7 +366,8 @@ def process_frame(frame, camera_id):
                 
                 # Generate filename with timestamp
                 filename_time_str = current_date.strftime('%Y%m%d_%H%M%S')
-                filename = f"{filename_time_str}_{dominant_emotion}.jpg"
+                saved_emotion = persisted_results[-1]["dominant_emotion"]
+                filename = f"{filename_time_str}_{saved_emotion}.jpg"
                 file_path = camera_dir / filename
                 
                 # Make sure the result_frame is a valid image
@@ -324,6 +380,7 @@ def process_frame(frame, camera_id):
                     cv2.imwrite(str(file_path), result_frame)
                 
                 print(f"Đã lưu ảnh nhận diện tại: {file_path}")
+                timings["image_save"] = time.time() - stage_start
                 
                 # Get absolute URL path
                 relative_path = f"/images/{safe_camera_id}/{year_month}/{filename}"
@@ -335,8 +392,10 @@ def process_frame(frame, camera_id):
                     "saved_image": {
                         "path": relative_path,
                         "filename": filename,
-                        "full_path": str(file_path)
-                    }
+                        "full_path": str(file_path),
+                        "emotion": saved_emotion
+                    },
+                    "timings": timings
                 }
             except Exception as save_error:
                 print(f"Lỗi lưu ảnh: {str(save_error)}")
@@ -346,7 +405,8 @@ def process_frame(frame, camera_id):
         return {
             "timestamp": timestamp,
             "camera_id": camera_id,
-            "results": results
+            "results": results,
+            "timings": timings
         }
     except Exception as e:
         print(f"Error in processing: {str(e)}")
@@ -371,8 +431,68 @@ def add_camera(camera: dict):
         return {"success": False, "error": "Failed to add camera"}
 
 @app.get("/detections")
-def get_detections(camera_id: str = None, from_time: float = None, to_time: float = None, limit: int = 100):
-    return db_manager.get_detections(camera_id, from_time, to_time, limit)
+def get_detections(response: Response, camera_id: str = None, from_time: float = None, to_time: float = None,
+                   limit: int = 100, cursor: str = None):
+    """Newest detections first; the X-Next-Cursor header holds the cursor of the next page"""
+    before_timestamp = before_id = None
+    if cursor:
+        try:
+            timestamp_part, id_part = cursor.split(":")
+            before_timestamp, before_id = float(timestamp_part), int(id_part)
+        except ValueError:
+            return {"error": "Cursor không hợp lệ, định dạng đúng là <timestamp>:<id>"}
+    
+    detections = db_manager.get_detections(camera_id, from_time, to_time, limit,
+                                           before_timestamp=before_timestamp, before_id=before_id)
+    if len(detections) == limit and detections:
+        last = detections[-1]
+        response.headers["X-Next-Cursor"] = f"{last['timestamp']!r}:{last['id']}"
+    return detections
+
+@app.get("/detections/export")
+def export_detections(format: str = "ndjson", camera_id: str = None, from_time: float = None,
+                      to_time: float = None, batch_size: int = 5000):
+    """Stream all matching detections, oldest first, without loading them into memory"""
+    if batch_size < 1:
+        return {"error": "batch_size phải lớn hơn hoặc bằng 1"}
+    if format not in ("ndjson", "csv", "arrow", "parquet"):
+        return {"error": "Định dạng không hỗ trợ, chọn ndjson, csv, arrow hoặc parquet"}
+    if format in ("arrow", "parquet") and importlib.util.find_spec("pyarrow") is None:
+        # pyarrow là phụ thuộc tùy chọn, chỉ cần cho xuất dữ liệu phân tích
+        return {"error": "Cần cài đặt pyarrow để xuất định dạng Arrow/Parquet"}
+    
+    # Đọc lô đầu tiên trước khi gửi header để lỗi kết nối trả về thông báo lỗi
+    batches = db_manager.iter_detections(camera_id, from_time, to_time, batch_size)
+    try:
+        first_batch = next(batches, None)
+    except Exception as e:
+        return {"error": f"Xuất dữ liệu thất bại: {str(e)}"}
+    if first_batch is not None:
+        batches = itertools.chain([first_batch], batches)
+    filename = f"detections_{int(time.time())}"
+    
+    if format == "ndjson":
+        return StreamingResponse(detection_export.ndjson_chunks(batches), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": f"attachment; filename={filename}.ndjson"})
+    if format == "csv":
+        return StreamingResponse(detection_export.csv_chunks(batches), media_type="text/csv",
+                                 headers={"Content-Disposition": f"attachment; filename={filename}.csv"})
+    if format == "arrow":
+        return StreamingResponse(detection_export.arrow_chunks(batches),
+                                 media_type="application/vnd.apache.arrow.stream",
+                                 headers={"Content-Disposition": f"attachment; filename={filename}.arrow"})
+    
+    # Parquet ghi footer ở cuối tệp nên phải ghi ra tệp tạm trước khi gửi
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        detection_export.write_parquet(batches, path)
+    except Exception as e:
+        os.remove(path)
+        print(f"Lỗi khi xuất Parquet: {str(e)}")
+        return {"error": str(e)}
+    return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{filename}.parquet",
+                        background=BackgroundTask(os.remove, path))
 
 @app.get("/saved-images")
 def get_saved_images(camera_id: str = None):
@@ -470,7 +590,6 @@ def parse_image_filename(filename):
 @app.get("/images/{camera_id}/{year_month}/{image_name}")
 async def get_image(camera_id: str, year_month: str, image_name: str):
     """Get a specific saved image"""
-    from fastapi.responses import FileResponse
     try:
         # Làm sạch tham số để tránh path traversal
         safe_camera_id = ''.join(c if c.isalnum() or c in ['-', '_'] else '_' for c in camera_id)
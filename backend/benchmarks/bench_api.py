@@ -0,0 +1,315 @@
+"""Load test for the backend API.
+
+Simulates N cameras sending frames at M FPS to one endpoint and reports
+throughput, latency percentiles, dropped frames and the per-stage timings
+returned by the server. Without --url the app is started in a separate
+process with a stub database and a stub inference backend, so transport and
+storage can be measured separately from model cost.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_api --endpoint process_frame --cameras 4 --fps 5 --duration 30
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import websockets
+
+ENDPOINTS = ("process_frame", "upload_frame", "ws", "detections")
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def load_frames(source, max_frames, width, height):
+    """Return a list of JPEG-encoded frames"""
+    if source == "sample":
+        paths = sorted(BACKEND_DIR.glob("**/detected_images/**/*.jpg"))
+        random.Random(0).shuffle(paths)
+        frames = [p.read_bytes() for p in paths[:max_frames]]
+        if frames:
+            return frames
+        print("Không tìm thấy ảnh mẫu, dùng khung hình tổng hợp")
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(max_frames):
+        image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        ok, encoded = cv2.imencode(".jpg", image)
+        if ok:
+            frames.append(encoded.tobytes())
+    return frames
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.timings = {}
+        self.sent = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def record(self, latency, body):
+        self.sent += 1
+        if not isinstance(body, (dict, list)) or (isinstance(body, dict) and "error" in body):
+            self.errors += 1
+            return
+        self.latencies.append(latency)
+        if isinstance(body, dict):
+            for stage, value in body.get("timings", {}).items():
+                self.timings.setdefault(stage, []).append(value)
+
+    def report(self, duration):
+        def percentiles(values):
+            if not values:
+                return {"p50": None, "p95": None, "p99": None, "mean": None}
+            ms = np.asarray(values) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(ms.mean())}
+
+        return {
+            "sent": self.sent,
+            "ok": len(self.latencies),
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "throughput": len(self.latencies) / duration if duration else 0.0,
+            "latency_ms": percentiles(self.latencies),
+            "stages_ms": {stage: percentiles(values) for stage, values in sorted(self.timings.items())}
+        }
+
+
+def http_request(url, data=None, headers=None, timeout=30):
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            raw = response.read()
+        latency = time.perf_counter() - start
+        return latency, json.loads(raw)
+    except Exception as e:
+        return time.perf_counter() - start, {"error": str(e)}
+
+
+def build_request(endpoint, base_url, camera_id, frame, data_url):
+    """Return (url, body, headers) for one HTTP request"""
+    if endpoint == "process_frame":
+        payload = {
+            "client_id": f"bench_{camera_id}",
+            "camera_id": camera_id,
+            "camera_name": f"Bench {camera_id}",
+            "timestamp": time.time(),
+            "frame": data_url,
+            "metadata": {"cameraType": "webcam"}
+        }
+        return (f"{base_url}/process_frame", json.dumps(payload).encode(),
+                {"Content-Type": "application/json"})
+
+    if endpoint == "upload_frame":
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="frame.jpg"\r\n'
+                f"Content-Type: image/jpeg\r\n\r\n").encode() + frame + f"\r\n--{boundary}--\r\n".encode()
+        return (f"{base_url}/upload-frame/{urllib.parse.quote(camera_id)}", body,
+                {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    query = urllib.parse.urlencode({"camera_id": camera_id, "limit": 100})
+    return f"{base_url}/detections?{query}", None, {}
+
+
+async def paced(fps, duration, stats, send):
+    """Call send() at a fixed rate, counting ticks missed while busy as dropped"""
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / fps
+    end = loop.time() + duration
+    next_tick = loop.time()
+    index = 0
+    while next_tick < end:
+        await send(index)
+        index += 1
+        next_tick += interval
+        behind = loop.time() - next_tick
+        if behind > 0:
+            skipped = int(behind // interval) + 1
+            stats.dropped += skipped
+            next_tick += skipped * interval
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def run_http_camera(args, base_url, camera_id, frames, data_urls, stats, executor):
+    loop = asyncio.get_running_loop()
+
+    async def send(index):
+        i = index % len(frames)
+        url, body, headers = build_request(args.endpoint, base_url, camera_id, frames[i], data_urls[i])
+        latency, response = await loop.run_in_executor(executor, http_request, url, body, headers)
+        stats.record(latency, response)
+
+    await paced(args.fps, args.duration, stats, send)
+
+
+async def run_ws_camera(args, base_url, camera_id, data_urls, stats):
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/bench_{camera_id}/{camera_id}"
+    async with websockets.connect(ws_url, max_size=None) as websocket:
+        async def send(index):
+            start = time.perf_counter()
+            try:
+                await websocket.send(data_urls[index % len(data_urls)])
+                response = json.loads(await websocket.recv())
+            except Exception as e:
+                response = {"error": str(e)}
+            stats.record(time.perf_counter() - start, response)
+
+        await paced(args.fps, args.duration, stats, send)
+
+
+async def run_load(args, base_url, frames):
+    data_urls = ["data:image/jpeg;base64," + base64.b64encode(f).decode() for f in frames]
+    stats = Stats()
+    executor = ThreadPoolExecutor(max_workers=args.cameras)
+    camera_ids = [f"bench_cam_{i}" for i in range(args.cameras)]
+    try:
+        if args.endpoint == "ws":
+            tasks = [run_ws_camera(args, base_url, cam, data_urls, stats) for cam in camera_ids]
+        else:
+            tasks = [run_http_camera(args, base_url, cam, frames, data_urls, stats, executor) for cam in camera_ids]
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=False)
+    return stats.report(elapsed)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(args, work_dir, timeout=60):
+    """Start the app in a subprocess and return (base_url, process)"""
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.stub_server", "--port", str(port),
+               "--db", args.db, "--inference", args.inference,
+               "--inference-delay", str(args.inference_delay),
+               "--seed", str(args.seed), "--cameras", str(args.cameras)]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND_DIR), os.getenv("PYTHONPATH")])))
+    if args.persist_every_frame:
+        # Must be set before the app creates its EmotionSmoother
+        env["EMOTION_SAMPLE_INTERVAL"] = "0"
+
+    # Ảnh nhận diện được ghi vào thư mục tạm thay vì thư mục làm việc
+    process = subprocess.Popen(command, cwd=work_dir, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=1):
+                return base_url, process
+        except OSError:
+            time.sleep(0.1)
+    stop_local_server(process)
+    raise RuntimeError(f"Server did not start within {timeout}s")
+
+
+def stop_local_server(process, timeout=30):
+    # SIGTERM lets uvicorn run shutdown handlers such as the postgres cleanup
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_report(args, report):
+    print(f"\nEndpoint: {args.endpoint}  cameras={args.cameras}  fps={args.fps}  duration={args.duration}s")
+    print(f"Sent: {report['sent']}  OK: {report['ok']}  Errors: {report['errors']}  Dropped: {report['dropped']}")
+    print(f"Throughput: {report['throughput']:.2f} frames/s")
+
+    def row(name, p):
+        if p["p50"] is None:
+            print(f"  {name:<12} -")
+        else:
+            print(f"  {name:<12} p50={p['p50']:8.2f}  p95={p['p95']:8.2f}  p99={p['p99']:8.2f}  mean={p['mean']:8.2f}")
+
+    print("Latency (ms):")
+    row("total", report["latency_ms"])
+    if report["stages_ms"]:
+        print("Server stages (ms):")
+        for stage, p in report["stages_ms"].items():
+            row(stage, p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the emotion recognition API")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="process_frame")
+    parser.add_argument("--cameras", type=int, default=4, help="Number of simulated cameras")
+    parser.add_argument("--fps", type=float, default=2.0, help="Frames per second per camera")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--url", help="Base URL of a running server; starts a local one if omitted")
+    parser.add_argument("--db", choices=("stub", "postgres"), default="stub",
+                        help="Database backend for the local server")
+    parser.add_argument("--inference", choices=("stub", "deepface"), default="stub",
+                        help="Inference backend for the local server")
+    parser.add_argument("--inference-delay", type=float, default=0.0,
+                        help="Seconds the stub inference sleeps per frame to mimic model cost")
+    parser.add_argument("--frames", choices=("sample", "synthetic"), default="sample",
+                        help="Use saved detected_images JPEGs or random synthetic frames")
+    parser.add_argument("--max-frames", type=int, default=50)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Detections to insert before the run (local server only)")
+    parser.add_argument("--persist-every-frame", action="store_true",
+                        help="Store every frame instead of only label changes, to measure storage cost")
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.max_frames, args.width, args.height)
+    json_path = Path(args.json).resolve() if args.json else None
+
+    process = work_dir = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        if args.db == "postgres":
+            print("Cảnh báo: benchmark ghi vào cơ sở dữ liệu DB_NAME trong config.env, "
+                  "các bản ghi bench_cam_* sẽ bị xóa khi kết thúc")
+        work_dir = tempfile.TemporaryDirectory(prefix="emotion_bench_")
+        try:
+            base_url, process = start_local_server(args, work_dir.name)
+        except RuntimeError as e:
+            work_dir.cleanup()
+            sys.exit(f"Không thể khởi động server: {e}")
+
+    try:
+        report = asyncio.run(run_load(args, base_url, frames))
+    finally:
+        if process is not None:
+            stop_local_server(process)
+            work_dir.cleanup()
+
+    print_report(args, report)
+    if json_path:
+        report["config"] = vars(args)
+        json_path.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
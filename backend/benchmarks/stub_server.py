@@ -0,0 +1,72 @@
+"""Server process started by bench_api.
+
+Runs the app with the requested database and inference backends in its own
+interpreter, so the load generator does not share the server's GIL.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+
+from .stubs import load_app
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def cleanup_postgres(db_manager):
+    """Delete the rows and cameras written by the benchmark from the configured database"""
+    try:
+        cursor = db_manager.conn.cursor()
+        cursor.execute("DELETE FROM detections WHERE camera_id LIKE %s", ("bench\\_cam\\_%",))
+        detections = cursor.rowcount
+        cursor.execute("DELETE FROM cameras WHERE id LIKE %s", ("bench\\_cam\\_%",))
+        db_manager.conn.commit()
+        cursor.close()
+        print(f"Đã xóa {detections} bản ghi benchmark khỏi cơ sở dữ liệu")
+    except Exception as e:
+        print(f"Error cleaning up benchmark rows: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API for a benchmark")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--db", choices=("stub", "postgres"), default="stub")
+    parser.add_argument("--inference", choices=("stub", "deepface"), default="stub")
+    parser.add_argument("--inference-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cameras", type=int, default=1)
+    args = parser.parse_args()
+
+    # Same configuration as run.py; variables already set in the environment win
+    load_dotenv(BACKEND_DIR / "config.env")
+
+    app = load_app(args.db, args.inference, args.inference_delay)
+    from app import main as app_main
+    db_manager = app_main.db_manager
+
+    if args.db == "postgres":
+        if db_manager.conn is None:
+            sys.exit("Không kết nối được PostgreSQL, kiểm tra cấu hình DB_* trong config.env")
+        app.add_event_handler("shutdown", lambda: cleanup_postgres(db_manager))
+
+    now = time.time()
+    for i in range(args.seed):
+        if not db_manager.store_detection(
+            camera_id=f"bench_cam_{i % args.cameras}",
+            timestamp=now - i,
+            emotion="neutral",
+            confidence=90.0,
+            face_location={"x": 0, "y": 0, "width": 100, "height": 100}
+        ):
+            if args.db == "postgres":
+                cleanup_postgres(db_manager)
+            sys.exit("Không thể chèn dữ liệu seed")
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import sys
+import time
+import types
+import random
+
+EMOTIONS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+
+class StubDBManager:
+    """In-memory stand-in for DBManager so storage cost is not measured"""
+
+    def __init__(self):
+        self.cameras = {}
+        self.detections = []
+
+    def store_detection(self, camera_id, timestamp, emotion, confidence, face_location):
+        if camera_id not in self.cameras:
+            self.add_camera(camera_id, f"Camera {camera_id}", "http://unknown", "unknown")
+        self.detections.append({
+            "id": len(self.detections) + 1,
+            "camera_id": camera_id,
+            "timestamp": timestamp,
+            "emotion": emotion,
+            "confidence": confidence,
+            "face_location": face_location,
+            "created_at": None
+        })
+        return True
+
+    def get_cameras(self):
+        return list(self.cameras.values())
+
+    def _filter(self, camera_id=None, from_time=None, to_time=None):
+        return [d for d in self.detections
+                if (not camera_id or d["camera_id"] == camera_id)
+                and (not from_time or d["timestamp"] >= from_time)
+                and (not to_time or d["timestamp"] <= to_time)]
+
+    def get_detections(self, camera_id=None, from_time=None, to_time=None, limit=100,
+                       before_timestamp=None, before_id=None):
+        rows = self._filter(camera_id, from_time, to_time)
+        if before_timestamp is not None and before_id is not None:
+            rows = [d for d in rows if (d["timestamp"], d["id"]) < (before_timestamp, before_id)]
+        rows.sort(key=lambda d: (d["timestamp"], d["id"]), reverse=True)
+        return rows[:limit]
+
+    def iter_detections(self, camera_id=None, from_time=None, to_time=None, batch_size=5000):
+        rows = sorted(self._filter(camera_id, from_time, to_time), key=lambda d: (d["timestamp"], d["id"]))
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def add_camera(self, camera_id, name, url, camera_type):
+        self.cameras[camera_id] = {
+            "id": camera_id,
+            "name": name,
+            "url": url,
+            "type": camera_type,
+            "created_at": None
+        }
+        return True
+
+
+class StubDeepFace:
+    """Replacement for DeepFace.analyze returning one face with noisy emotions"""
+
+    delay = 0.0
+
+    @classmethod
+    def analyze(cls, frame, actions=None, enforce_detection=True):
+        if cls.delay:
+            time.sleep(cls.delay)
+        height, width = frame.shape[:2]
+        scores = {emotion: random.random() for emotion in EMOTIONS}
+        scores["neutral"] += 1.0
+        total = sum(scores.values())
+        return [{
+            "emotion": {emotion: score / total * 100 for emotion, score in scores.items()},
+            "region": {"x": width // 4, "y": height // 4, "w": width // 2, "h": height // 2}
+        }]
+
+
+def load_app(db="stub", inference="stub", inference_delay=0.0):
+    """Import the FastAPI app with the requested database and inference backends"""
+    if inference == "stub":
+        # Tránh nạp TensorFlow khi chỉ đo chi phí truyền tải và lưu trữ
+        StubDeepFace.delay = inference_delay
+        sys.modules.setdefault("deepface", types.SimpleNamespace(DeepFace=StubDeepFace))
+
+    if db == "stub":
+        from app import db_manager as db_module
+        db_module.DBManager = StubDBManager
+
+    from app import main
+    if inference == "stub":
+        main.DeepFace = StubDeepFace
+    return main.app
@@ -0,0 +1 @@
+# Puts the backend directory on sys.path so tests can import the app package
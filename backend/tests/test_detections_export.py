@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import StubDBManager, load_app
+
+app = load_app()
+from app import main  # noqa: E402  (imported after load_app installs the stubs)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    stub = StubDBManager()
+    monkeypatch.setattr(main, "db_manager", stub)
+    return stub
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def seed(db, count, camera_id="cam_1"):
+    # Two rows share each timestamp so the cursor must break ties on id
+    for i in range(count):
+        db.store_detection(camera_id, 1000.0 + i // 2, "happy", 0.9, {"x": i, "y": 0, "width": 10, "height": 10})
+
+
+def fetch_all_pages(client, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/detections", params=params)
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return pages
+
+
+def test_keyset_pages_cover_all_rows_with_timestamp_ties(db, client):
+    seed(db, 25)
+    pages = fetch_all_pages(client, 10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+
+    rows = [row for page in pages for row in page]
+    assert len({row["id"] for row in rows}) == 25
+    keys = [(row["timestamp"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_next_cursor_only_on_full_pages(db, client):
+    seed(db, 20)
+    pages = fetch_all_pages(client, 10)
+    # The second page is full, so a cursor is returned and the third page is empty
+    assert [len(page) for page in pages] == [10, 10, 0]
+
+    response = client.get("/detections", params={"limit": 50})
+    assert "x-next-cursor" not in response.headers
+
+
+def test_malformed_cursor_returns_error(db, client):
+    seed(db, 3)
+    for cursor in ("bad", "1000.0", "abc:1", "1000.0:x"):
+        assert "error" in client.get("/detections", params={"cursor": cursor}).json()
+
+
+def test_export_ndjson(db, client):
+    seed(db, 12)
+    seed(db, 3, camera_id="cam_2")
+    response = client.get("/detections/export", params={"format": "ndjson", "batch_size": 5, "camera_id": "cam_1"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 13))
+    assert rows[0]["face_location"] == {"x": 0, "y": 0, "width": 10, "height": 10}
+
+
+def test_export_csv(db, client):
+    seed(db, 12)
+    response = client.get("/detections/export", params={"format": "csv", "batch_size": 5})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == list(range(1, 13))
+    assert json.loads(rows[0]["face_location"])["x"] == 0
+
+
+def test_export_arrow(db, client):
+    pa = pytest.importorskip("pyarrow")
+    seed(db, 12)
+    response = client.get("/detections/export", params={"format": "arrow", "batch_size": 5})
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == list(range(1, 13))
+
+
+def test_export_parquet(db, client):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    seed(db, 12)
+    response = client.get("/detections/export", params={"format": "parquet", "batch_size": 5})
+    parquet_file = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet_file.metadata.num_rows == 12
+    assert parquet_file.num_row_groups == 3
+
+
+def test_export_empty_results(db, client):
+    assert client.get("/detections/export", params={"format": "ndjson"}).text == ""
+
+    rows = list(csv.reader(io.StringIO(client.get("/detections/export", params={"format": "csv"}).text)))
+    assert rows == [["id", "camera_id", "timestamp", "emotion", "confidence", "face_location", "created_at"]]
+
+
+def test_export_empty_results_columnar(db, client):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    arrow = client.get("/detections/export", params={"format": "arrow"}).content
+    assert pa.ipc.open_stream(arrow).read_all().num_rows == 0
+
+    parquet = client.get("/detections/export", params={"format": "parquet"}).content
+    assert pq.ParquetFile(io.BytesIO(parquet)).metadata.num_rows == 0
+
+
+@pytest.mark.parametrize("batch_size", [0, -1])
+def test_export_rejects_invalid_batch_size(db, client, batch_size):
+    assert "error" in client.get("/detections/export", params={"batch_size": batch_size}).json()
+
+
+def test_export_rejects_unknown_format(db, client):
+    assert "error" in client.get("/detections/export", params={"format": "xml"}).json()
@@ -0,0 +1,99 @@
+import pytest
+
+from app.emotion_smoother import EmotionSmoother
+
+FACE = {"x": 100, "y": 100, "width": 80, "height": 80}
+
+
+def make_smoother(**kwargs):
+    options = {"time_constant": 2, "margin": 0.1, "sample_interval": 1000, "max_distance": 0.5, "track_ttl": 3}
+    options.update(kwargs)
+    return EmotionSmoother(**options)
+
+
+def test_noisy_stream_persists_single_label():
+    smoother = make_smoother()
+    persisted = []
+    for i in range(40):
+        # Raw winner flips every frame, neutral leads slightly on average
+        emotion = {"neutral": 0.6, "sad": 0.4} if i % 2 == 0 else {"neutral": 0.45, "sad": 0.55}
+        state = smoother.update("cam", emotion, FACE, i * 0.1)
+        if state["persist"]:
+            persisted.append(state["emotion"])
+    assert persisted == ["neutral"]
+
+
+def test_sustained_switch_changes_label_once():
+    smoother = make_smoother()
+    persisted = []
+    for i in range(60):
+        emotion = {"neutral": 0.9, "happy": 0.1} if i < 10 else {"neutral": 0.1, "happy": 0.9}
+        state = smoother.update("cam", emotion, FACE, i * 0.1)
+        if state["persist"]:
+            persisted.append(state["emotion"])
+    assert persisted == ["neutral", "happy"]
+
+
+def test_faces_in_same_frame_get_separate_tracks():
+    smoother = make_smoother()
+    other = {"x": 400, "y": 100, "width": 80, "height": 80}
+    first = smoother.update("cam", {"happy": 1.0}, FACE, 0.0)
+    second = smoother.update("cam", {"sad": 1.0}, other, 0.0)
+    assert first["track_id"] != second["track_id"]
+
+    # Each face keeps its own track on the next frame
+    assert smoother.update("cam", {"happy": 1.0}, FACE, 0.1)["track_id"] == first["track_id"]
+    assert smoother.update("cam", {"sad": 1.0}, other, 0.1)["track_id"] == second["track_id"]
+
+
+def test_track_expires_after_ttl():
+    smoother = make_smoother(track_ttl=3)
+    first = smoother.update("cam", {"happy": 1.0}, FACE, 0.0)
+    assert smoother.update("cam", {"happy": 1.0}, FACE, 2.0)["track_id"] == first["track_id"]
+
+    state = smoother.update("cam", {"happy": 1.0}, FACE, 6.0)
+    assert state["track_id"] != first["track_id"]
+    assert state["persist"]
+
+
+def test_sample_interval_triggers_persist():
+    smoother = make_smoother(sample_interval=5)
+    persisted = [t for t in range(11) if smoother.update("cam", {"neutral": 1.0}, FACE, float(t))["persist"]]
+    assert persisted == [0, 5, 10]
+
+
+@pytest.fixture
+def default_env(monkeypatch):
+    for name in ("EMOTION_SMOOTHING_TIME_CONSTANT", "EMOTION_SMOOTHING_MARGIN", "EMOTION_SAMPLE_INTERVAL",
+                 "EMOTION_TRACK_MAX_DISTANCE", "EMOTION_TRACK_TTL", "EMOTION_FRAME_INTERVAL"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_defaults_keep_track_at_frontend_cadence(default_env):
+    # The frontend sends one frame every 4 seconds
+    smoother = EmotionSmoother()
+    states = []
+    for i in range(10):
+        emotion = {"neutral": 60, "sad": 40} if i % 2 == 0 else {"neutral": 45, "sad": 55}
+        states.append(smoother.update("cam", emotion, FACE, i * 4.0))
+    assert {s["track_id"] for s in states} == {0}
+    assert {s["emotion"] for s in states} == {"neutral"}
+    # Only the first frame and the 30 s sample interval are persisted
+    assert [i * 4 for i, s in enumerate(states) if s["persist"]] == [0, 32]
+
+
+def test_label_change_lag_is_time_based(default_env):
+    # Same switch at 4 s and 0.25 s spacing changes label after similar elapsed time
+    lags = []
+    for spacing in (4.0, 0.25):
+        smoother = EmotionSmoother()
+        t = 0.0
+        while t < 20:
+            smoother.update("cam", {"neutral": 90, "happy": 10}, FACE, t)
+            t += spacing
+        switch_time = t
+        while smoother.update("cam", {"neutral": 10, "happy": 90}, FACE, t)["emotion"] != "happy":
+            t += spacing
+        lags.append(t - switch_time)
+    assert all(lag <= 12 for lag in lags)
+    assert abs(lags[0] - lags[1]) <= 4
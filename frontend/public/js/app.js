@@ -740,7 +740,7 @@ function sendFrameToServer(cameraId, camera, frameData) {
                 // Tạo thông báo đã lưu ảnh trên giao diện
                 const savedIndicator = document.createElement('div');
                 savedIndicator.className = 'saved-indicator';
-                savedIndicator.innerHTML = `<span>Đã lưu ảnh cảm xúc: ${data.results[0]?.dominant_emotion}</span>`;
+                savedIndicator.innerHTML = `<span>Đã lưu ảnh cảm xúc: ${data.saved_image.emotion || data.results[0]?.dominant_emotion}</span>`;
                 cameraElement.querySelector('.video-wrapper').appendChild(savedIndicator);
                 
                 // Tự động ẩn thông báo sau 3 giây
@@ -1072,7 +1072,7 @@ function captureSingleFrame(cameraId) {
                 if (data.saved_image) {
                     const savedIndicator = document.createElement('div');
                     savedIndicator.className = 'saved-indicator';
-                    savedIndicator.innerHTML = `<span>Đã lưu ảnh! Cảm xúc: ${data.results[0]?.dominant_emotion}</span>`;
+                    savedIndicator.innerHTML = `<span>Đã lưu ảnh! Cảm xúc: ${data.saved_image.emotion || data.results[0]?.dominant_emotion}</span>`;
                     cameraElement.querySelector('.video-wrapper').appendChild(savedIndicator);
                     
                     setTimeout(() => {
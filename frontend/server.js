@@ -277,7 +277,7 @@ app.post('/api/create-mobile-page', (req, res) => {
 
 app.get('/api/detections', async (req, res) => {
   try {
-    const { camera_id, from_time, to_time, limit } = req.query;
+    const { camera_id, from_time, to_time, limit, cursor } = req.query;
     let url = `${backendApiUrl}/detections`;
     
     // Construct query parameters
@@ -286,12 +286,19 @@ app.get('/api/detections', async (req, res) => {
     if (from_time) params.append('from_time', from_time);
     if (to_time) params.append('to_time', to_time);
     if (limit) params.append('limit', limit);
+    if (cursor) params.append('cursor', cursor);
     
     if (params.toString()) {
       url += `?${params.toString()}`;
     }
     
     const response = await axios.get(url);
+    
+    // Chuyển tiếp cursor trang tiếp theo (keyset pagination)
+    const nextCursor = response.headers['x-next-cursor'];
+    if (nextCursor) {
+      res.set('X-Next-Cursor', nextCursor);
+    }
     res.json(response.data);
   } catch (error) {
     console.error('Error fetching detections:', error);